@@ -2,9 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
-from io import BytesIO
 import warnings
 import base64
+import hashlib
+import os
+import tempfile
+import openpyxl
+import polars as pl
 warnings.filterwarnings('ignore')
 
 # --------------------------
@@ -30,102 +34,248 @@ plotly_config = {
     'locale': 'zh-CN'
 }
 
+# PDF嵌入HTML生成（以文件内容摘要作为缓存键：无关控件变化导致重跑时，不再重复进行base64编码）
+# _pdf_bytes以下划线开头，Streamlit不对其计算哈希；缓存跨会话共享且单条可达上百MB，仅保留最近1份
+@st.cache_data(max_entries=1, show_spinner=False)
+def pdf_iframe_html(pdf_digest, _pdf_bytes, height):
+    base64_pdf = base64.b64encode(_pdf_bytes).decode('ascii')  # base64结果仅含ASCII字符
+    return f"""
+        <iframe 
+            src="data:application/pdf;base64,{base64_pdf}" 
+            width="100%" 
+            height="{height}" 
+            type="application/pdf"
+            style="border: none; border-radius: 4px;"
+        ></iframe>
+        """
+
 # PDF显示函数（保留原功能）
 def display_pdf(pdf_data, height=800):
     try:
         if isinstance(pdf_data, str) and pdf_data.endswith(".pdf"):
             with open(pdf_data, "rb") as f:
                 pdf_bytes = f.read()
-        elif hasattr(pdf_data, "getbuffer"):
-            pdf_bytes = pdf_data.getbuffer()
-        elif isinstance(pdf_data, (bytes, BytesIO)):
-            pdf_bytes = pdf_data if isinstance(pdf_data, bytes) else pdf_data.read()
+        elif hasattr(pdf_data, "getvalue"):  # 上传文件对象/BytesIO（直接取完整字节，不移动读取位置）
+            pdf_bytes = pdf_data.getvalue()
+        elif isinstance(pdf_data, bytes):
+            pdf_bytes = pdf_data
         else:
             st.error("❌ 不支持的PDF数据类型，请传入本地路径、上传文件或字节流")
             return
         
-        base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-        pdf_display = f"""
-        <iframe 
-            src="data:application/pdf;base64,{base64_pdf}" 
-            width="100%" 
-            height="{height}" 
-            type="application/pdf"
-            style="border: none; border-radius: 4px;"
-        ></iframe>
-        """
-        st.markdown(pdf_display, unsafe_allow_html=True)
+        pdf_digest = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+        st.markdown(pdf_iframe_html(pdf_digest, pdf_bytes, height), unsafe_allow_html=True)
     except Exception as e:
         st.error(f"❌ PDF显示失败：{str(e)}")
 
 # --------------------------
 # 2. 数据读取与清洗（固定Excel路径为C:\Users\张珊\Desktop\3\数字化转型指数汇总_行业信息完整.xlsx）
 # --------------------------
-@st.cache_data  # 缓存数据，避免重复读取
-def load_data():
-    # 固定Excel文件路径（已按要求设置为目标路径）
-    excel_path = r"C:\Users\张珊\Desktop\3\数字化转型指数汇总_行业信息完整.xlsx"
+# 固定Excel文件路径（已按要求设置为目标路径）
+EXCEL_PATH = r"C:\Users\张珊\Desktop\3\数字化转型指数汇总_行业信息完整.xlsx"
+
+# DataFrame参数的缓存键：对逐行哈希结果（C实现，向量化）再做blake2b摘要，避免Streamlit默认哈希遍历整个对象
+def _df_hash(df):
+    return hashlib.blake2b(pd.util.hash_pandas_object(df, index=True).values.tobytes(), digest_size=16).digest()
+
+# 读取Excel原始数据，并写入Parquet缓存文件
+def _read_excel_raw(excel_path, cache_path):
+    # 只读模式+仅取值（不构建完整单元格对象，内存与CPU开销大幅降低）
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
     try:
-        # 读取Excel文件（指定openpyxl引擎，确保.xlsx文件兼容）
-        df = pd.read_excel(excel_path, sheet_name="Sheet1", engine="openpyxl")
-    except FileNotFoundError:
-        st.error(f"❌ 未找到Excel文件，请检查路径：{excel_path}")
-        st.stop()  # 停止运行，避免后续报错
-    except Exception as e:
-        st.error(f"❌ Excel文件读取失败：{str(e)}（可能是文件损坏或格式不兼容，建议用Excel打开确认）")
-        st.stop()
-    
-    # 1. 校验必要字段（与Excel列名完全匹配）
+        ws = wb["Sheet1"]
+        header = next(ws.iter_rows(max_row=1, values_only=True))
+        df = pd.DataFrame(ws.iter_rows(min_row=2, values_only=True), columns=header)
+        # 空字符串单元格视为空值（与pd.read_excel行为一致，便于后续清洗）
+        df = df.replace("", np.nan)
+    finally:
+        wb.close()  # 只读模式需手动关闭，释放文件句柄
+    # 写入Parquet缓存：先写同目录临时文件再原子替换，进程中途退出或多进程同时写入时不会留下残缺的缓存文件
+    # （写入失败不影响本次使用，下次仍回退读取Excel）
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".", suffix=".parquet.tmp")
+        os.close(fd)
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
+
+# 数据清洗（删除空值、重复值，规范字段类型）+ 重命名字段（与后续功能逻辑统一），在Polars引擎中执行后转为pandas
+def _clean_raw(ldf, required_columns):
+    return (
+        ldf.select(required_columns)
+        # 删除关键字段为空的行
+        .drop_nulls(required_columns)
+        # 规范数据类型：年份→int16整数（无法转换的异常值置空后移除），指数→float32数值型
+        # 窄类型使缓存pickle、磁盘缓存及传给浏览器的图表数据体积减半，4位小数显示无精度损失
+        .with_columns(
+            pl.col("年份").cast(pl.Int16, strict=False),
+            pl.col("数字化转型综合指数").cast(pl.Float32, strict=False)
+        )
+        .drop_nulls("年份")
+        # 删除重复行（保持原始行顺序）
+        .unique(maintain_order=True)
+        .rename({
+            "股票代码": "企业代码",
+            "数字化转型综合指数": "数字化转型指数"
+        })
+        .collect()
+        .to_pandas()
+    )
+
+# 持久化到磁盘缓存（进程重启/新worker启动后直接加载，无需重新解析Excel）
+# 注：persist="disk"时Streamlit会忽略ttl，改为以Excel修改时间作为缓存键，文件更新后自动失效
+@st.cache_data(persist="disk", max_entries=4, show_spinner="加载Excel…")
+def _load_raw(excel_path, excel_mtime):
     required_columns = ["股票代码", "企业名称", "年份", "数字化转型综合指数", "行业代码", "行业名称"]
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        st.error(f"❌ Excel表缺少必要字段：{', '.join(missing_cols)}")
-        st.stop()
+    # Parquet缓存文件与Excel同目录，首次读取Excel后生成，后续冷启动直接读取（列式存储，速度远快于解析Excel）
+    cache_path = excel_path + ".parquet"
+    df_clean = None
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= excel_mtime:
+        try:
+            # 惰性扫描Parquet（仅读取用到的列，清洗在Polars多线程引擎中执行）
+            # 扫描与collect均在保护范围内：缓存文件尾部截断或数据页损坏都只会触发回退，不影响应用运行
+            ldf = pl.scan_parquet(cache_path)
+            # 缓存缺少必要字段时同样回退读取Excel（由下方校验给出提示）
+            if all(col in ldf.collect_schema().names() for col in required_columns):
+                df_clean = _clean_raw(ldf, required_columns)
+        except Exception:
+            df_clean = None  # 缓存文件损坏：回退读取Excel并重写缓存
+    if df_clean is None:
+        try:
+            df = _read_excel_raw(excel_path, cache_path)
+        except FileNotFoundError:
+            st.error(f"❌ 未找到Excel文件，请检查路径：{excel_path}")
+            st.stop()  # 停止运行，避免后续报错
+        except Exception as e:
+            st.error(f"❌ Excel文件读取失败：{str(e)}（可能是文件损坏或格式不兼容，建议用Excel打开确认）")
+            st.stop()
+        
+        # 1. 校验必要字段（与Excel列名完全匹配）
+        missing_cols = [col for col in required_columns if col not in df.columns]
+        if missing_cols:
+            st.error(f"❌ Excel表缺少必要字段：{', '.join(missing_cols)}")
+            st.stop()
+        
+        # 2. 数据清洗 + 3. 重命名字段
+        df_clean = _clean_raw(pl.from_pandas(df).lazy(), required_columns)
     
-    # 2. 数据清洗（删除空值、重复值，规范字段类型）
-    df_clean = df[required_columns].copy()
-    # 删除关键字段为空的行，重置索引避免筛选错位
-    df_clean = df_clean.dropna(subset=required_columns).reset_index(drop=True)
-    # 规范数据类型：年份→整数（排除异常值），指数→数值型
-    df_clean["年份"] = pd.to_numeric(df_clean["年份"], errors="coerce")
-    df_clean = df_clean[df_clean["年份"].notna()].reset_index(drop=True)  # 移除年份为空的异常行
-    df_clean["年份"] = df_clean["年份"].astype(int)
-    df_clean["数字化转型综合指数"] = pd.to_numeric(df_clean["数字化转型综合指数"], errors="coerce")
-    # 删除重复行，再次重置索引
-    df_clean = df_clean.drop_duplicates().reset_index(drop=True)
+    # 4. 代码/名称字段转为分类类型（每个唯一值只存一份，筛选、分组、去重均按整数编码执行）
+    # 企业代码统一为6位字符串（如1→000001），与输入提示中的股票代码格式一致
+    df_clean["企业代码"] = df_clean["企业代码"].astype(str).str.zfill(6)
+    for c in ("企业代码", "企业名称", "行业代码", "行业名称"):
+        df_clean[c] = df_clean[c].astype("category")
     
-    # 3. 重命名字段（与后续功能逻辑统一）
-    df_clean.rename(columns={
-        "股票代码": "企业代码",
-        "数字化转型综合指数": "数字化转型指数"
-    }, inplace=True)
+    # 5. 预建(企业代码, 年份)有序索引（查询时按代码二分切片，结果已按年份排序）
+    enterprise_indexed = df_clean.set_index(["企业代码", "年份"]).sort_index()
     
-    # 4. 计算行业平均指数（按行业+年份分组，避免重复计算）
-    industry_avg = df_clean.groupby(["行业代码", "行业名称", "年份"])["数字化转型指数"].mean().reset_index()
+    return df_clean, enterprise_indexed
+
+# 行业平均指数单独缓存、按需计算（仅在需要行业数据的功能中调用，结果跨会话共享）
+@st.cache_data(persist="disk", max_entries=4, show_spinner=False, hash_funcs={pd.DataFrame: _df_hash})
+def compute_industry_avg(df_clean):
+    # 按行业+年份分组计算平均指数
+    # observed=True：分类字段仅对实际出现的组合分组，避免生成全部类别的笛卡尔积；sort=False：跳过分组键排序
+    # as_index=False：分组键直接作为普通列返回，无需再reset_index
+    industry_avg = df_clean.groupby(["行业代码", "行业名称", "年份"], observed=True, sort=False, as_index=False)["数字化转型指数"].mean()
     industry_avg.rename(columns={"数字化转型指数": "行业平均指数"}, inplace=True)
-    
-    return df_clean, industry_avg
+    industry_avg["行业平均指数"] = industry_avg["行业平均指数"].astype("float32")
+    # 预建(行业代码, 行业名称, 年份)有序索引（个别行业代码对应多个行业名称，需同时按名称定位）
+    industry_indexed = industry_avg.set_index(["行业代码", "行业名称", "年份"]).sort_index()
+    return industry_avg, industry_indexed
+
+def load_enterprise(excel_path):
+    try:
+        excel_mtime = os.path.getmtime(excel_path)
+    except FileNotFoundError:
+        st.error(f"❌ 未找到Excel文件，请检查路径：{excel_path}")
+        st.stop()
+    df_clean, enterprise_indexed = _load_raw(excel_path, excel_mtime)
+    # 校验清洗结果（关键字段全部为空等情况下无有效数据，后续功能无法运行）
+    if df_clean.empty:
+        st.error("❌ Excel表清洗后没有有效数据，请检查必要字段是否均已填写")
+        st.stop()
+    return df_clean, enterprise_indexed
+
+# 读取企业数据（调用固定路径的加载函数；行业平均指数在对应功能中按需计算）
+enterprise_data, enterprise_indexed = load_enterprise(EXCEL_PATH)
+
+# 分类字段模糊匹配：仅遍历唯一值集合（远小于总行数），再用isin按整数编码筛选全部行
+def match_categories(column, keyword):
+    keyword = keyword.lower()
+    matched = [c for c in column.cat.categories if keyword in c.lower()]
+    return column.isin(matched)
 
-# 读取数据（调用固定路径的加载函数）
-enterprise_data, industry_avg = load_data()
+# 生成“名称（代码：xxx）”选项标签→(名称, 代码)的反查字典（整列向量化拼接，避免逐行apply与字符串解析）
+def build_label_map(names, codes):
+    labels = names.astype(str).values + "（代码：" + codes.astype(str).values + "）"
+    return dict(zip(labels, zip(names, codes)))
+
+# 多行业对比的全部行业选项（按行业名称排序，数据不变时跨重跑复用）
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _df_hash})
+def industry_label_map(industry_avg):
+    all_industries = industry_avg[["行业代码", "行业名称"]].drop_duplicates().sort_values("行业名称")
+    return build_label_map(all_industries["行业名称"], all_industries["行业代码"])
 
 # --------------------------
 # 3. Plotly交互图表生成函数（核心悬停功能，保留原逻辑）
 # --------------------------
+# 图表固定样式配置（优化中文显示与布局，每次生成图表时仅合并标题/坐标轴文字）
+chart_layout = dict(
+    hovermode="closest",  # 鼠标靠近点时优先显示该点数据，避免多线干扰
+    width=1200,
+    height=600,
+    legend=dict(x=0.01, y=0.99, bgcolor="rgba(255,255,255,0.8)"),  # 图例放在左上角，半透明背景
+    font=dict(family="SimHei", size=12)  # 全局字体设置为黑体，避免中文乱码
+)
+
+# LTTB（最大三角形三桶）降采样：点数超过n_out时按桶保留视觉上最显著的点，保持曲线形状
+# 注：年度数据远小于阈值时原样返回，仅在后续扩展到月度/日度等高频数据时生效
+def lttb_downsample(x_data, y_data, n_out=1000):
+    n = len(y_data)
+    if n <= n_out or n_out < 3:
+        return x_data, y_data
+    x = np.asarray(x_data, dtype=float)
+    y = np.nan_to_num(np.asarray(y_data, dtype=float))  # 空值仅在选点计算时按0处理，输出仍保留原值
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # 首尾点固定保留，中间分为n_out-2个桶
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # 下一桶均值点作为三角形第三个顶点，选出当前桶中三角形面积最大的点
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return np.asarray(x_data)[keep], np.asarray(y_data)[keep]
+
+# 缓存图表结果（输入数据不变时，重跑脚本直接复用已生成的图表，无需重新构建Figure）
+@st.cache_data(max_entries=32, show_spinner=False)
 def create_hover_chart(x_data, y_data_list, labels, title, x_label="年份", y_label="数字化转型指数"):
     """
-    生成支持鼠标悬停的Plotly折线图
+    生成支持鼠标悬停的Plotly折线图（返回图表字典，可直接传入st.plotly_chart）
     - x_data: X轴数据（年份，统一数组确保对齐）
     - y_data_list: Y轴数据列表（如[企业指数数组, 行业平均指数数组]）
     - labels: 每条折线的名称（如["平安银行指数", "货币金融服务平均指数"]）
     - title: 图表标题
     """
     fig = go.Figure()
+    # 每条折线先降采样（减少浏览器端需渲染的点数）
+    traces = [lttb_downsample(x_data, y_data) for y_data in y_data_list]
+    # 数据点较多时改用WebGL渲染（SVG在上千个点时渲染与悬停明显卡顿）
+    total_points = sum(len(y_plot) for _, y_plot in traces)
+    use_webgl = total_points > 2000
+    scatter_cls = go.Scattergl if use_webgl else go.Scatter
     # 遍历所有Y轴数据，添加折线（显示线+点，确保悬停可触发）
-    for y_data, label in zip(y_data_list, labels):
-        fig.add_trace(go.Scatter(
-            x=x_data,
-            y=y_data,
+    for (x_plot, y_plot), label in zip(traces, labels):
+        fig.add_trace(scatter_cls(
+            x=x_plot,
+            y=np.asarray(y_plot, dtype="float32"),  # 保持float32，避免图表JSON编码时上转为float64
             mode="lines+markers",
             name=label,
             # 悬停文本：自定义显示“年份+数值”（保留4位小数，提升精度）
@@ -134,18 +284,17 @@ def create_hover_chart(x_data, y_data_list, labels, title, x_label="年份", y_l
             marker=dict(size=6)  # 点放大，便于鼠标捕捉
         ))
     
-    # 图表样式配置（优化中文显示与布局）
+    # 图表样式配置（固定样式+标题/坐标轴文字）
     fig.update_layout(
         title=title,
         xaxis_title=x_label,
         yaxis_title=y_label,
-        hovermode="closest",  # 鼠标靠近点时优先显示该点数据，避免多线干扰
-        width=1200,
-        height=600,
-        legend=dict(x=0.01, y=0.99, bgcolor="rgba(255,255,255,0.8)"),  # 图例放在左上角，半透明背景
-        font=dict(family="SimHei", size=12)  # 全局字体设置为黑体，避免中文乱码
+        **chart_layout
     )
-    return fig
+    if use_webgl:
+        # 大数据量时按X轴统一显示悬停信息，减少鼠标移动时逐点拾取的开销
+        fig.update_layout(hovermode="x unified")
+    return fig.to_dict()
 
 # --------------------------
 # 4. 侧边栏导航（保留原功能，优化数据概览显示）
@@ -182,10 +331,13 @@ if query_type == "PDF报告预览":
 st.sidebar.divider()
 st.sidebar.subheader("📊 数据概览")
 try:
-    enterprise_count = enterprise_data["企业名称"].nunique()
-    industry_count = industry_avg["行业名称"].nunique()
-    year_min = enterprise_data["年份"].min()
-    year_max = enterprise_data["年份"].max()
+    # 均为O(1)读取，无需逐行扫描：分类字段的类别即全部唯一值（行业平均指数由企业数据分组得到，行业集合一致）
+    enterprise_count = len(enterprise_data["企业名称"].cat.categories)
+    industry_count = len(enterprise_data["行业名称"].cat.categories)
+    # 有序索引的年份层级即去重并排序后的全部年份
+    data_years = enterprise_indexed.index.levels[1]
+    year_min = data_years[0]
+    year_max = data_years[-1]
     st.sidebar.write(f"企业数量：{enterprise_count} 家")
     st.sidebar.write(f"行业数量：{industry_count} 个")
     st.sidebar.write(f"数据年份范围：{year_min} - {year_max}")
@@ -195,72 +347,73 @@ except Exception as e:
 # --------------------------
 # 5. 核心功能1：企业数字化指数查询（集成Plotly交互）
 # --------------------------
-if query_type == "企业数字化指数查询":
+# 各查询功能以片段（fragment）方式运行：输入框/选择框变化时仅重跑所在片段，不重跑侧边栏与数据加载等整页逻辑
+@st.fragment
+def enterprise_query(enterprise_data, enterprise_indexed):
     st.title("🏢 企业数字化转型指数查询")
     st.divider()
     
     # 双输入框：支持企业代码/名称模糊查询（带示例提示）
-    col1, col2 = st.columns(2)
-    with col1:
-        enterprise_code = st.text_input("输入企业代码（如：000820）", placeholder="支持模糊匹配，例：0008")
-    with col2:
-        enterprise_name = st.text_input("输入企业名称（如：平安银行）", placeholder="支持模糊匹配，例：平安")
+    # 放在表单中：输入过程中不触发重跑，点击“查询”或按回车后才提交（之后重跑时保留上次提交的输入）
+    with st.form("enterprise_query_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            enterprise_code = st.text_input("输入企业代码（如：000820）", placeholder="支持模糊匹配，例：0008")
+        with col2:
+            enterprise_name = st.text_input("输入企业名称（如：平安银行）", placeholder="支持模糊匹配，例：平安")
+        st.form_submit_button("查询")
     
     # 触发查询逻辑（任一输入框有内容即执行查询）
     if enterprise_code or enterprise_name:
-        # 初始化筛选掩码（避免索引不匹配导致的筛选错误）
-        filter_mask = np.zeros(len(enterprise_data), dtype=bool)
-        # 企业代码筛选（转为字符串避免数值匹配误差，如000820被识别为820）
+        # 企业代码/名称筛选（不区分大小写，两个条件满足其一即可）
+        masks = []
         if enterprise_code:
-            filter_mask |= enterprise_data["企业代码"].astype(str).str.contains(enterprise_code, case=False, na=False)
-        # 企业名称筛选（不区分大小写，忽略空值）
+            masks.append(match_categories(enterprise_data["企业代码"], enterprise_code))
         if enterprise_name:
-            filter_mask |= enterprise_data["企业名称"].str.contains(enterprise_name, case=False, na=False)
+            masks.append(match_categories(enterprise_data["企业名称"], enterprise_name))
+        filter_mask = masks[0] if len(masks) == 1 else masks[0] | masks[1]
         
-        # 筛选结果排序，重置索引
-        result = enterprise_data[filter_mask].sort_values(["企业名称", "年份"]).reset_index(drop=True)
+        # 筛选结果排序（后续仅按列取值或按位置读取，无需重置索引）
+        result = enterprise_data[filter_mask].sort_values(["企业名称", "年份"])
         
         # 处理无匹配结果的情况
         if result.empty:
             st.warning("⚠️ 未找到匹配的企业，请检查输入关键词（如特殊字符*ST需完整输入）或尝试其他查询方式")
         else:
             # 多企业匹配时，让用户选择具体企业（避免数据混淆）
-            unique_enterprises = result[["企业代码", "企业名称"]].drop_duplicates().reset_index(drop=True)
+            unique_enterprises = result[["企业代码", "企业名称"]].drop_duplicates()
             if len(unique_enterprises) > 1:
                 st.subheader("🔍 匹配到以下企业，请选择目标企业")
+                enterprise_labels = build_label_map(unique_enterprises["企业名称"], unique_enterprises["企业代码"])
                 selected_enterprise = st.selectbox(
                     "选择企业",
-                    options=unique_enterprises.apply(lambda x: f"{x['企业名称']}（代码：{x['企业代码']}）", axis=1),
+                    options=list(enterprise_labels),
                     help="若企业名称重复，可通过代码区分"
                 )
                 # 提取选中企业的名称与代码
-                selected_name = selected_enterprise.split("（代码：")[0]
-                selected_code = selected_enterprise.split("（代码：")[1].replace("）", "")
-                # 筛选该企业的详细数据（按年份排序）
-                enterprise_detail = result[
-                    (result["企业名称"] == selected_name) & 
-                    (result["企业代码"] == selected_code)
-                ].sort_values("年份").reset_index(drop=True)
+                selected_name, selected_code = enterprise_labels[selected_enterprise]
             else:
                 # 仅匹配到1家企业，直接提取数据
-                selected_name = unique_enterprises.iloc[0]["企业名称"]
-                selected_code = unique_enterprises.iloc[0]["企业代码"]
-                enterprise_detail = result.sort_values("年份").reset_index(drop=True)
+                # 按位置直接读取标量（列顺序为[企业代码, 企业名称]），避免构造整行Series
+                selected_code = unique_enterprises.iat[0, 0]
+                selected_name = unique_enterprises.iat[0, 1]
+            # 按代码切片该企业的详细数据（索引已按年份排序），再按名称区分同一代码更名前后的记录
+            enterprise_detail = enterprise_indexed.loc[selected_code].reset_index()
+            enterprise_detail = enterprise_detail[enterprise_detail["企业名称"] == selected_name]
             
             # 1. 显示企业基础信息（行业、数据时间范围）
             st.subheader(f"📈 {selected_name}（代码：{selected_code}）数字化转型指数")
-            industry_info = enterprise_detail.iloc[0][["行业代码", "行业名称"]]
-            st.write(f"所属行业：{industry_info['行业名称']}（行业代码：{industry_info['行业代码']}）")
+            ind_code = enterprise_detail.iat[0, enterprise_detail.columns.get_loc("行业代码")]
+            ind_name = enterprise_detail.iat[0, enterprise_detail.columns.get_loc("行业名称")]
+            st.write(f"所属行业：{ind_name}（行业代码：{ind_code}）")
             st.write(f"数据时间范围：{enterprise_detail['年份'].min()} - {enterprise_detail['年份'].max()}")
             
-            # 2. 匹配行业平均数据（确保年份对齐，避免部分年份缺失导致图表错位）
-            industry_index = industry_avg[
-                (industry_avg["行业代码"] == industry_info["行业代码"]) & 
-                (industry_avg["年份"].isin(enterprise_detail["年份"]))
-            ].sort_values("年份").reset_index(drop=True)
-            # 强制对齐年份（用企业数据的年份为基准，补全行业平均数据）
+            # 2. 匹配行业平均数据，强制对齐年份（用企业数据的年份为基准，补全行业平均数据，避免图表错位）
             merged_years = enterprise_detail["年份"].values
-            industry_index_aligned = industry_index.set_index("年份").reindex(merged_years).reset_index()["行业平均指数"].values
+            _, industry_indexed = compute_industry_avg(enterprise_data)
+            industry_index_aligned = industry_indexed.loc[
+                (ind_code, ind_name)
+            ].reindex(merged_years)["行业平均指数"].values
             
             # 3. 生成并显示交互图表（核心功能：鼠标悬停显示数值）
             st.subheader("📊 指数趋势图（鼠标悬停查看具体数值）")
@@ -270,7 +423,7 @@ if query_type == "企业数字化指数查询":
                     enterprise_detail["数字化转型指数"].values,
                     industry_index_aligned
                 ],
-                labels=[f"{selected_name}指数", f"{industry_info['行业名称']}平均指数"],
+                labels=[f"{selected_name}指数", f"{ind_name}平均指数"],
                 title=f"{selected_name}数字化转型指数趋势（{merged_years.min()}-{merged_years.max()}）"
             )
             # 显示图表（适配页面宽度，传递中文配置）
@@ -288,56 +441,56 @@ if query_type == "企业数字化指数查询":
 # --------------------------
 # 6. 核心功能2：行业数字化指数查询（集成Plotly交互）
 # --------------------------
-elif query_type == "行业数字化指数查询":
+@st.fragment
+def industry_query(enterprise_data):
     st.title("🏭 行业数字化转型指数查询")
     st.divider()
     
-    # 双输入框：支持行业代码/名称模糊查询
-    col1, col2 = st.columns(2)
-    with col1:
-        industry_code = st.text_input("输入行业代码（如：J66）", placeholder="支持模糊匹配，例：J")
-    with col2:
-        industry_name = st.text_input("输入行业名称（如：货币金融服务）", placeholder="支持模糊匹配，例：金融")
+    # 双输入框：支持行业代码/名称模糊查询（表单提交后才执行查询）
+    with st.form("industry_query_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            industry_code = st.text_input("输入行业代码（如：J66）", placeholder="支持模糊匹配，例：J")
+        with col2:
+            industry_name = st.text_input("输入行业名称（如：货币金融服务）", placeholder="支持模糊匹配，例：金融")
+        st.form_submit_button("查询")
     
     # 触发查询逻辑
     if industry_code or industry_name:
-        # 初始化筛选掩码
-        filter_mask = np.zeros(len(industry_avg), dtype=bool)
-        # 行业代码筛选（不区分大小写）
+        industry_avg, industry_indexed = compute_industry_avg(enterprise_data)
+        # 行业代码/名称筛选（不区分大小写，两个条件满足其一即可）
+        masks = []
         if industry_code:
-            filter_mask |= industry_avg["行业代码"].str.contains(industry_code, case=False, na=False)
-        # 行业名称筛选（不区分大小写）
+            masks.append(match_categories(industry_avg["行业代码"], industry_code))
         if industry_name:
-            filter_mask |= industry_avg["行业名称"].str.contains(industry_name, case=False, na=False)
+            masks.append(match_categories(industry_avg["行业名称"], industry_name))
+        filter_mask = masks[0] if len(masks) == 1 else masks[0] | masks[1]
         
-        # 筛选结果排序，重置索引
-        result = industry_avg[filter_mask].sort_values(["行业名称", "年份"]).reset_index(drop=True)
+        # 筛选结果排序（后续仅按列取值或按位置读取，无需重置索引）
+        result = industry_avg[filter_mask].sort_values(["行业名称", "年份"])
         
         # 处理无匹配结果的情况
         if result.empty:
             st.warning("⚠️ 未找到匹配的行业，请检查输入关键词（如行业名称是否包含特殊符号）")
         else:
             # 多行业匹配时，让用户选择具体行业
-            unique_industries = result[["行业代码", "行业名称"]].drop_duplicates().reset_index(drop=True)
+            unique_industries = result[["行业代码", "行业名称"]].drop_duplicates()
             if len(unique_industries) > 1:
                 st.subheader("🔍 匹配到以下行业，请选择目标行业")
+                industry_labels = build_label_map(unique_industries["行业名称"], unique_industries["行业代码"])
                 selected_industry = st.selectbox(
                     "选择行业",
-                    options=unique_industries.apply(lambda x: f"{x['行业名称']}（代码：{x['行业代码']}）", axis=1)
+                    options=list(industry_labels)
                 )
                 # 提取选中行业的名称与代码
-                selected_ind_name = selected_industry.split("（代码：")[0]
-                selected_ind_code = selected_industry.split("（代码：")[1].replace("）", "")
-                # 筛选该行业的详细数据
-                industry_detail = result[
-                    (result["行业名称"] == selected_ind_name) & 
-                    (result["行业代码"] == selected_ind_code)
-                ].sort_values("年份").reset_index(drop=True)
+                selected_ind_name, selected_ind_code = industry_labels[selected_industry]
             else:
                 # 仅匹配到1个行业，直接提取数据
-                selected_ind_name = unique_industries.iloc[0]["行业名称"]
-                selected_ind_code = unique_industries.iloc[0]["行业代码"]
-                industry_detail = result.sort_values("年份").reset_index(drop=True)
+                # 按位置直接读取标量（列顺序为[行业代码, 行业名称]）
+                selected_ind_code = unique_industries.iat[0, 0]
+                selected_ind_name = unique_industries.iat[0, 1]
+            # 按(行业代码, 行业名称)切片该行业的详细数据（索引已按年份排序）
+            industry_detail = industry_indexed.loc[(selected_ind_code, selected_ind_name)].reset_index()
             
             # 1. 显示行业基础信息
             st.subheader(f"📈 {selected_ind_name}（代码：{selected_ind_code}）数字化转型指数")
@@ -364,31 +517,47 @@ elif query_type == "行业数字化指数查询":
 # --------------------------
 # 7. 核心功能3：多行业对比分析（集成Plotly交互）
 # --------------------------
-elif query_type == "多行业对比分析":
+@st.fragment
+def multi_industry_compare(enterprise_data):
     st.title("📊 多行业数字化转型指数对比")
     st.divider()
     st.write("💡 选择多个行业，对比其数字化转型指数趋势（含全选行业平均线）")
+    industry_avg, _ = compute_industry_avg(enterprise_data)
     
     # 行业选择：下拉多选，带搜索功能（按行业名称排序，优化选择体验）
-    all_industries = industry_avg[["行业代码", "行业名称"]].drop_duplicates().sort_values("行业名称").reset_index(drop=True)
+    # 同一份缓存字典既提供选项列表，也用于将选中标签反查为(行业名称, 行业代码)，无需解析字符串
+    all_industry_labels = industry_label_map(industry_avg)
+    industry_options = list(all_industry_labels)
     selected_industries = st.multiselect(
         "请选择要对比的行业（可多选，建议3-5个）",
-        options=all_industries.apply(lambda x: f"{x['行业名称']}（代码：{x['行业代码']}）", axis=1),
-        default=all_industries.apply(lambda x: f"{x['行业名称']}（代码：{x['行业代码']}）", axis=1).head(2),  # 默认选前2个行业
+        options=industry_options,
+        default=industry_options[:2],  # 默认选前2个行业
         help="选择过多行业会导致图表拥挤，建议不超过5个"
     )
     
     # 当选择行业数量≥1时，执行对比逻辑
     if selected_industries:
         # 提取选中行业的名称与代码
-        selected_ind_names = [ind.split("（代码：")[0] for ind in selected_industries]
-        selected_ind_codes = [ind.split("（代码：")[1].replace("）", "") for ind in selected_industries]
+        selected_ind_names, selected_ind_codes = map(list, zip(*(all_industry_labels[ind] for ind in selected_industries)))
         
-        # 筛选选中行业的平均指数数据
-        compare_data = industry_avg[industry_avg["行业名称"].isin(selected_ind_names)].sort_values(["行业名称", "年份"]).reset_index(drop=True)
-        # 计算全选行业的整体平均指数（用于对比参考）
-        overall_avg = compare_data.groupby("年份")["行业平均指数"].mean().reset_index()
-        overall_avg.rename(columns={"行业平均指数": "全选行业平均指数"}, inplace=True)
+        # 筛选选中行业的平均指数数据（按行业代码+名称组合匹配，个别行业名称对应多个行业代码）
+        selected_pairs = list(zip(selected_ind_codes, selected_ind_names))
+        pair_mask = pd.MultiIndex.from_frame(industry_avg[["行业代码", "行业名称"]]).isin(selected_pairs)
+        compare_data = industry_avg[pair_mask]
+        # 一次透视得到“年份×行业”对齐矩阵（缺失年份为空值，避免图表错位），列顺序与选择顺序一致
+        # 每个行业每年仅一条平均值，直接透视无需聚合
+        compare_matrix = compare_data.pivot(
+            index="年份",
+            columns=["行业名称", "行业代码"],
+            values="行业平均指数"
+        ).reindex(columns=pd.MultiIndex.from_arrays([selected_ind_names, selected_ind_codes]))
+        # 列名使用行业名称（同名行业同时选中时附加代码区分）
+        compare_matrix.columns = [
+            name if selected_ind_names.count(name) == 1 else f"{name}（代码：{code}）"
+            for name, code in compare_matrix.columns
+        ]
+        # 计算全选行业的整体平均指数（按年份跨列求均值，忽略空值，用于对比参考）
+        overall_avg = compare_matrix.mean(axis=1)
         
         # 1. 显示对比行业的基础信息（名称+代码）
         st.subheader("🔍 对比行业信息")
@@ -401,18 +570,12 @@ elif query_type == "多行业对比分析":
             hide_index=True
         )
         
-        # 2. 准备对比数据（确保所有行业年份对齐，避免图表错位）
-        all_years = compare_data["年份"].unique()
-        y_data_list = []
-        labels = []
-        # 遍历每个行业，按统一年份对齐数据
-        for industry in selected_ind_names:
-            ind_data = compare_data[compare_data["行业名称"] == industry].set_index("年份").reindex(all_years).reset_index()
-            y_data_list.append(ind_data["行业平均指数"].values)
-            labels.append(f"{industry}平均指数")
-        # 添加全选行业平均线（按统一年份对齐）
-        overall_avg_aligned = overall_avg.set_index("年份").reindex(all_years).reset_index()["全选行业平均指数"].values
-        y_data_list.append(overall_avg_aligned)
+        # 2. 准备对比数据（直接取对齐矩阵的各列作为折线数据）
+        all_years = compare_matrix.index.values
+        y_data_list = [compare_matrix[column].values for column in compare_matrix.columns]
+        labels = [f"{column}平均指数" for column in compare_matrix.columns]
+        # 添加全选行业平均线
+        y_data_list.append(overall_avg.values)
         labels.append("全选行业平均指数")
         
         # 3. 生成多行业交互对比图
@@ -427,15 +590,20 @@ elif query_type == "多行业对比分析":
         
         # 4. 显示多行业历年数据对比表（透视表格式，更直观）
         st.subheader("📋 多行业历年指数对比表")
-        compare_table = compare_data.pivot_table(
-            index="年份",
-            columns="行业名称",
-            values="行业平均指数",
-            fill_value="-"  # 空值用"-"填充，避免显示NaN
-        ).round(4)  # 保留4位小数，提升精度
-        # 添加全选行业平均列（最后一列，便于对比）
-        compare_table["全选行业平均指数"] = overall_avg.set_index("年份")["全选行业平均指数"].round(4)
-        st.dataframe(compare_table, use_container_width=True)
+        # 添加全选行业平均列（最后一列，便于对比）；保留数值类型，空值在显示时再格式化
+        compare_table = compare_matrix.assign(全选行业平均指数=overall_avg).astype("float32").round(4)  # 保留4位小数，提升精度
+        st.dataframe(
+            compare_table.style.format("{:.4f}", na_rep="-"),  # 空值显示为"-"，避免显示NaN
+            use_container_width=True
+        )
+
+# 根据侧边栏选择调用对应查询功能
+if query_type == "企业数字化指数查询":
+    enterprise_query(enterprise_data, enterprise_indexed)
+elif query_type == "行业数字化指数查询":
+    industry_query(enterprise_data)
+elif query_type == "多行业对比分析":
+    multi_industry_compare(enterprise_data)
 
 # --------------------------
 # 8. 功能4：PDF报告预览（保留原功能，优化错误处理）
@@ -457,7 +625,6 @@ elif query_type == "PDF报告预览":
                 file_name = pdf_file.name
                 file_size = f"{pdf_file.size / (1024*1024):.2f} MB"  # 转换为MB
             else:  # 本地文件路径
-                import os
                 file_name = os.path.basename(pdf_file)
                 file_size = f"{os.path.getsize(pdf_file) / (1024*1024):.2f} MB"
             
@@ -485,14 +652,14 @@ st.markdown("""
 1. **数据来源**：Excel文件路径已固定为 `C:\\Users\\张珊\\Desktop\\3\\数字化转型指数汇总_行业信息完整.xlsx`，无需手动修改；
 2. **交互功能**：鼠标悬停在折线图的任意点上，会自动显示对应年份的指数数值（精确到4位小数）；
 3. **查询功能**：
-   - 企业查询：支持代码/名称模糊匹配，结果含趋势图与历年数据；
-   - 行业查询：支持代码/名称匹配，展示行业平均指数趋势；
+   - 企业查询：支持代码/名称模糊匹配（输入后点击“查询”或按回车执行），结果含趋势图与历年数据；
+   - 行业查询：支持代码/名称匹配（输入后点击“查询”或按回车执行），展示行业平均指数趋势；
    - 多行业对比：可选择3-5个行业，对比指数差异与整体平均水平；
    - PDF预览：支持上传或本地路径加载PDF报告，在线预览无需下载；
 4. **异常处理**：若数据显示异常，请检查：
    - Excel文件是否存在于固定路径，且未被占用；
    - Excel文件字段名与代码中“required_columns”完全一致（无错别字）；
-   - 安装必要依赖（执行 `pip install streamlit pandas plotly openpyxl`）。
+   - 安装必要依赖（执行 `pip install streamlit pandas plotly openpyxl pyarrow polars`）。
 
 ### ⚠️ 注意事项
 - 企业名称含特殊字符（如*ST、S深发展A）时，输入需完整匹配；